@@ -1,19 +1,21 @@
 from __future__ import annotations
-import os
+import subprocess
 import json
 from pathlib import Path
 import re
-from typing import Self
-from dataclasses import dataclass
+from typing import Iterator, Self
+from dataclasses import dataclass, asdict
 import logging
-
-import xmltodict
-from pydantic import BaseModel
+import html
+import itertools
 
 logging.basicConfig(level=logging.INFO)
 
 LV_VERSION = "20.0"
 
+# matches files like "LabVIEW 2009" left in the project root by older tooling
+_LV_VERSION_FILE_RE = re.compile(r"^LabVIEW \d{4}$")
+
 # get this scripts folder
 script_folder = Path(__file__).parent
 project_folder = script_folder.parent.parent
@@ -41,7 +43,8 @@ README_CONTRIBUTORS_SECTION = \
 """.lstrip()
 
 
-class ReadmeContext(BaseModel):
+@dataclass(slots=True)
+class ReadmeContext:
     package_display_name: str
     package_name: str
     package_description: str
@@ -78,8 +81,8 @@ README_TITLE_SECTION = """
 """.lstrip()
 
 
-def render_template(ctx: BaseModel, template: str):
-    rendered = template.format(**ctx.model_dump())
+def render_template(mapping: dict, template: str) -> str:
+    rendered = template.format_map(mapping)
     return rendered
 
 
@@ -127,49 +130,57 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 # Markdown Utils
 ##########################################################################################
 
-def get_heading_regex(heading_title: str, level: int = None) -> str:
-    if level is None:
-        regex = fr"^(#+)\s+{heading_title.strip()}"
-    else:
-        regex = fr"^{'#' * level}\s+{heading_title.strip()}"
-    return regex
+_GENERIC_HEADING_RE = re.compile(r"^(#+)\s+")
+
+# compiled heading patterns, keyed by (heading_title, level)
+_HEADING_RE_CACHE: dict[tuple[str, int | None], re.Pattern] = {}
+
+def get_heading_regex(heading_title: str, level: int = None) -> re.Pattern:
+    key = (heading_title, level)
+    pattern = _HEADING_RE_CACHE.get(key)
+    if pattern is None:
+        if level is None:
+            regex = fr"^(#+)\s+{heading_title.strip()}"
+        else:
+            regex = fr"^{'#' * level}\s+{heading_title.strip()}"
+        pattern = _HEADING_RE_CACHE[key] = re.compile(regex)
+    return pattern
 
 def find_markdown_heading(markdown_lines: list[str], heading: str, level:int = None, start_line:int=0) -> int | None:
     """Finds the line number of a markdown heading"""
-    heading_regex = get_heading_regex(heading, level)
-    pattern = re.compile(heading_regex)
-    for i, line in enumerate(markdown_lines[start_line:]):
-        if re.match(pattern, line):
-            return start_line + i
+    pattern = get_heading_regex(heading, level)
+    for i in range(start_line, len(markdown_lines)):
+        if pattern.match(markdown_lines[i]):
+            return i
     return None
 
 def get_heading_level(heading_line: str) -> int:
-    return len(re.match(r"^(#+)\s+", heading_line).group(1))
+    return len(_GENERIC_HEADING_RE.match(heading_line).group(1))
 
 def get_heading_title(heading_line: str) -> str:
     return re.match(r"^(#+)\s+(.+)", heading_line).group(2).strip()
 
 def find_markdown_section(markdown_lines: list[str], section_title: str, level:int = None, start_line:int=0):
     """Finds the start and end lines of a markdown section"""
-    heading_regex = get_heading_regex(section_title, level)
-    pattern = re.compile(heading_regex)
-    logging.info(f"heading_regex: `{heading_regex}`")
+    pattern = get_heading_regex(section_title, level)
+    logging.debug("heading_regex: `%s`", pattern.pattern)
     end_line = None
-    for i, line in enumerate(markdown_lines[start_line:]):
-        if re.match(pattern, line):
-            start_line += i
+    found = False
+    for i in range(start_line, len(markdown_lines)):
+        if pattern.match(markdown_lines[i]):
+            start_line = i
+            found = True
             break
-    if start_line is None:
+    if not found:
         return None, None
     level = get_heading_level(markdown_lines[start_line])
-    for i, line in enumerate(markdown_lines[start_line+1:]):
+    for i in range(start_line + 1, len(markdown_lines)):
+        line = markdown_lines[i]
         # check if the line is a heading and get the level
         # if the level is less than or equal to the current level, then we've reached the end of the section\
-        pattern = re.compile(r"^(#+)\s+")
-        match = re.match(pattern, line)
-        logging.info(f"line: {line}, match: {match}")
+        match = _GENERIC_HEADING_RE.match(line)
         if match and match.group(1) and len(match.group(1)) <= level:
-            end_line = start_line + i
+            end_line = i - 1
             break
     # if we didn't find an end line, then the section extends to the end of the file
     if end_line is None:
@@ -177,51 +188,95 @@ def find_markdown_section(markdown_lines: list[str], section_title: str, level:i
     return start_line, end_line
 
 def lines_to_string(lines: list[str]) -> str:
-    return "\n".join([line.rstrip() for line in lines])
+    return "\n".join(lines)
 
 def string_to_lines(string: str) -> list[str]:
-    return string.splitlines(keepends=True)
+    return string.splitlines()
+
+def splice_lines(markdown_lines: list[str], start_line: int, end_line: int, new_lines: list[str]) -> Iterator[str]:
+    """Yields the lines with `start_line` through `end_line` replaced by `new_lines`"""
+    return itertools.chain(
+        itertools.islice(markdown_lines, start_line),
+        new_lines,
+        itertools.islice(markdown_lines, end_line+1, None),
+    )
 
-def replace_markdown_section_content(markdown_string: str, section_title: str, new_content: str, replace_heading=False) -> tuple[str, bool]:
+def find_markdown_section_splice(markdown_lines: list[str], section_title: str, replace_heading=False):
+    """Finds the first and last lines to replace for a section (both `None` if the section is missing)"""
     logging.info(f"Replacing markdown section content for section: {section_title}")
-    markdown_lines = string_to_lines(markdown_string)
     start_line, end_line = find_markdown_section(markdown_lines, section_title)
-    if start_line is None:
-        return lines_to_string(markdown_lines), False
-    if not replace_heading:
+    if start_line is not None and not replace_heading:
         # let's just replace the content
         start_line += 1
-    new_markdown_lines = markdown_lines[:start_line-1] + string_to_lines(new_content) + markdown_lines[end_line+1:]
-    return lines_to_string(new_markdown_lines), True
+    return start_line, end_line
 
+def replace_markdown_section_lines(markdown_lines: list[str], section_title: str, new_lines: list[str], replace_heading=False) -> tuple[list[str], bool]:
+    start_line, end_line = find_markdown_section_splice(markdown_lines, section_title, replace_heading)
+    if start_line is None:
+        return markdown_lines, False
+    return list(splice_lines(markdown_lines, start_line, end_line, new_lines)), True
 
-def add_markdown_section(markdown_string: str, new_content: str, after_heading: str = None, at_begining=False) -> tuple[str, bool]:
+
+def replace_markdown_section_content(markdown_string: str, section_title: str, new_content: str, replace_heading=False) -> tuple[str, bool]:
+    markdown_lines = string_to_lines(markdown_string)
+    start_line, end_line = find_markdown_section_splice(markdown_lines, section_title, replace_heading)
+    if start_line is None:
+        return markdown_string, False
+    # join straight from the splice so no intermediate list is built
+    return "\n".join(splice_lines(markdown_lines, start_line, end_line, string_to_lines(new_content))), True
+
+
+def add_markdown_section_lines(markdown_lines: list[str], new_lines: list[str], after_heading: str = None, at_begining=False) -> tuple[list[str], bool]:
     assert not (after_heading and at_begining), "Can't specify both `after_heading` and `at_begining`"
-    
+
     if at_begining:
-        return new_content + markdown_string, True
-    
-    markdown_lines = string_to_lines(markdown_string)
+        return new_lines + markdown_lines, True
+
     if after_heading:
         start_line = find_markdown_heading(markdown_lines, after_heading)
         if start_line is None:
             start_line = len(markdown_lines) - 1
     else:
         start_line = len(markdown_lines) - 1
-    
-    new_markdown_lines = markdown_lines[:start_line+1] + string_to_lines(new_content) + markdown_lines[start_line+1:]
-    return "\n".join(new_markdown_lines), True
 
+    new_markdown_lines = markdown_lines[:start_line+1]
+    if new_markdown_lines and new_markdown_lines[-1].strip() and new_lines and new_lines[0].strip():
+        # keep the new section in its own block
+        new_markdown_lines.append("")
+    new_markdown_lines.extend(new_lines)
+    new_markdown_lines.extend(markdown_lines[start_line+1:])
+    return new_markdown_lines, True
 
-def add_or_replace_markdown_section_content(markdown_string: str, section_title: str, new_content: str, replace_heading=False, after_heading:str = None,
-                                            at_beginning = False) -> str:
-    new_markdown, changed = replace_markdown_section_content(markdown_string, section_title, new_content, replace_heading)
+
+def add_markdown_section(markdown_string: str, new_content: str, after_heading: str = None, at_begining=False) -> tuple[str, bool]:
+    if at_begining:
+        assert not after_heading, "Can't specify both `after_heading` and `at_begining`"
+        return new_content + markdown_string, True
+
+    new_markdown_lines, changed = add_markdown_section_lines(
+        string_to_lines(markdown_string), string_to_lines(new_content), after_heading=after_heading
+    )
+    return lines_to_string(new_markdown_lines), changed
+
+
+def add_or_replace_markdown_section_lines(markdown_lines: list[str], section_title: str, new_lines: list[str], replace_heading=False, after_heading:str = None,
+                                          at_beginning = False) -> list[str]:
+    new_markdown_lines, changed = replace_markdown_section_lines(markdown_lines, section_title, new_lines, replace_heading)
     if changed:
         logging.info("Replaced content")
     if not changed:
         logging.info("Adding new content")
-        new_markdown, changed = add_markdown_section(markdown_string, new_content, after_heading=after_heading, at_beginning=at_beginning)
-    return new_markdown
+        new_markdown_lines, changed = add_markdown_section_lines(markdown_lines, new_lines, after_heading=after_heading, at_begining=at_beginning)
+    return new_markdown_lines
+
+
+def add_or_replace_markdown_section_content(markdown_string: str, section_title: str, new_content: str, replace_heading=False, after_heading:str = None,
+                                            at_beginning = False) -> str:
+    new_markdown_lines = add_or_replace_markdown_section_lines(
+        string_to_lines(markdown_string), section_title, string_to_lines(new_content), replace_heading,
+        after_heading=after_heading, at_beginning=at_beginning,
+    )
+    return lines_to_string(new_markdown_lines)
 
 
 ##########################################################################################
@@ -248,11 +303,11 @@ def github_project_from_url(url: str) -> GitHubProject:
     if not is_github_project:
         raise ValueError("This project is not hosted on GitHub")
 
-    github_owner = url.split("/")[-2]
-    github_project = url.split("/")[-1]
+    head, _, github_project = url.rpartition("/")
+    github_owner = head.rpartition("/")[2]
 
     # remove the `.git` extension if present
-    github_project = github_project.rstrip(".git")
+    github_project = github_project.removesuffix(".git")
 
     return GitHubProject(project_owner=github_owner, project_name=github_project)
 
@@ -267,7 +322,12 @@ def create_all_contributorsrc(file_path, gh: GitHubProject):
 
 
 def get_xml_tag_value(xml_string, xml_tag):
-    return xml_string.split(f"<{xml_tag}>")[1].split(f"</{xml_tag}>")[0].strip()
+    # only match an element holding text (or a self-closing, empty one), so that we get the
+    # `<Description>` nested inside `Advanced_Settings/Description` in a .vipb file, not its parent
+    match = re.search(fr"<{xml_tag}>([^<]*)</{xml_tag}>|<{xml_tag}\s*/>", xml_string)
+    if match is None:
+        raise ValueError(f"<{xml_tag}> not found")
+    return html.unescape((match.group(1) or "").strip())
 
 
 def get_package_name(vipb_file):
@@ -284,6 +344,53 @@ def get_package_display_name(vipb_file):
     return package_display_name
 
 
+def update_readme(readme: Path, ctx_map: dict) -> bool:
+    """Creates or updates the README sections, returns `True` if the file was written"""
+    # Checking README.md exists
+    # (the README is edited in memory and written once at the end)
+    if readme.exists():
+        readme_content = readme.read_text(encoding="utf-8")
+        readme_lines = string_to_lines(readme_content)
+        # splitting into lines drops the final newline, so remember to put it back
+        ends_with_newline = readme_content.endswith("\n")
+    else:
+        logging.info(f"{ascii_warning} README.md not found in project root. Creating one...")
+        readme_content = None
+        ends_with_newline = True
+        readme_lines = string_to_lines(
+            render_template(ctx_map, README_TITLE_SECTION)
+            + render_template(ctx_map, README_INSTALLATION_SECTION)
+            + render_template(ctx_map, README_HOW_TO_CONTRIBUTE_SECTION)
+        )
+
+    # Checking README.md for `## Contributors` section
+    has_contributors_section = find_markdown_heading(readme_lines, "Contributors", level=2) is not None
+    if has_contributors_section:
+        logging.info(f"{ascii_checkmark} README.md has a `## Contributors` section")
+    else:
+        logging.info(
+            f"{ascii_warning} README.md does not have a `## Contributors` section. Adding one..."
+        )
+        readme_lines, _ = add_markdown_section_lines(
+            readme_lines, string_to_lines(render_template(ctx_map, README_CONTRIBUTORS_SECTION))
+        )
+
+    # Update `## How to Contribute` section
+    readme_lines = add_or_replace_markdown_section_lines(
+        markdown_lines=readme_lines,
+        section_title="How to Contribute",
+        new_lines=string_to_lines(render_template(ctx_map, README_HOW_TO_CONTRIBUTE_SECTION)),
+        replace_heading=True,
+    )
+    new_readme_content = lines_to_string(readme_lines)
+    if ends_with_newline:
+        new_readme_content += "\n"
+    if new_readme_content == readme_content:
+        return False
+    readme.write_text(new_readme_content, encoding="utf-8")
+    return True
+
+
 def main():
     ##########################################################################################
     # Setup
@@ -294,7 +401,13 @@ def main():
     ##########################################################################################
     # Reading git origin url
     ##########################################################################################
-    git_origin_url = os.popen("git config --get remote.origin.url").read().strip()
+    try:
+        git_origin_url = subprocess.run(
+            ["git", "config", "--get", "remote.origin.url"], capture_output=True, text=True, check=False
+        ).stdout.strip()
+    except FileNotFoundError:
+        # git is not installed, which is handled below like a project without a GitHub origin
+        git_origin_url = ""
     logging.info(f"{ascii_checkmark} git_origin_url: {git_origin_url}")
 
     # Checking if project is hosted on GitHub...
@@ -312,26 +425,16 @@ def main():
     ##########################################################################################
 
     vipb_file = project_folder / "source" / ".vipb"
-    vipb_string = vipb_file.read_text()
-
-    vipb_dict = xmltodict.parse(vipb_string)
-
-    # logging.info(json.dumps(vipb_dict, indent=4))
-
     if not vipb_file.exists():
         logging.info(f"{ascii_cross} .vipb file not found in project source folder")
         raise FileNotFoundError(".vipb file not found in project source folder")
 
-    # sub-dictionaries
-    vipb_settings = vipb_dict["VI_Package_Builder_Settings"]
-    vipb_library_settings = vipb_settings["Library_General_Settings"]
-    vipb_advanced_settings = vipb_settings["Advanced_Settings"]
-    vipb_description = vipb_advanced_settings["Description"]
+    vipb_string = vipb_file.read_text()
 
     # values
-    package_name = vipb_library_settings["Package_File_Name"]
-    package_display_name = vipb_library_settings["Product_Name"]
-    package_description = vipb_description["Description"]
+    package_name = get_xml_tag_value(vipb_string, "Package_File_Name")
+    package_display_name = get_xml_tag_value(vipb_string, "Product_Name")
+    package_description = get_xml_tag_value(vipb_string, "Description")
 
     logging.info(f"{ascii_checkmark} Package name: {package_name}")
     logging.info(f"{ascii_checkmark} Display name: {package_display_name}")
@@ -344,6 +447,7 @@ def main():
         github_project_name=gh.project_name,
         github_project_owner=gh.project_owner,
     )
+    ctx_map = asdict(readme_ctx)
 
     ##########################################################################################
     # Checking for .all-contributorsrc file
@@ -357,50 +461,9 @@ def main():
         create_all_contributorsrc(file_path=all_contributorsrc, gh=gh)
 
     ##########################################################################################
-    # Checking README.md exists
-    ##########################################################################################
-    readme = project_folder / "README.md"
-    if not readme.exists():
-        logging.info(f"{ascii_warning} README.md not found in project root. Creating one...")
-        # write an empty file
-        with open(readme, "w") as file:
-            file.write(render_template(readme_ctx, README_TITLE_SECTION))
-            file.write(render_template(readme_ctx, README_INSTALLATION_SECTION))
-            file.write(render_template(readme_ctx, README_HOW_TO_CONTRIBUTE_SECTION))
-
-    ##########################################################################################
-    # Checking README.md for `## Contributors` section
-    ##########################################################################################
-    readme = project_folder / "README.md"
-    if not readme.exists():
-        logging.info(f"{ascii_warning} README.md not found in project root")
-        return
-    with open(readme, "r") as file:
-        readme_content = file.read()
-        has_contributors_section = "## Contributors" in readme_content
-        if has_contributors_section:
-            logging.info(f"{ascii_checkmark} README.md has a `## Contributors` section")
-        else:
-            logging.info(
-                f"{ascii_warning} README.md does not have a `## Contributors` section. Adding one..."
-            )
-
-            with open(readme, "a") as file:
-                file.write(render_template(readme_ctx, README_CONTRIBUTORS_SECTION))
-
-    ##########################################################################################
-    # Update `## How to Contribute` section
+    # Checking README.md sections
     ##########################################################################################
-    with open(readme, "r") as file:
-        readme_content = file.read()
-        new_readme_content = add_or_replace_markdown_section_content(
-            markdown_string=readme_content,
-            section_title="How to Contribute",
-            new_content=render_template(readme_ctx, README_HOW_TO_CONTRIBUTE_SECTION),
-        )
-        if new_readme_content != readme_content:
-            with open(readme, "w") as file:
-                file.write(new_readme_content)
+    update_readme(project_folder / "README.md", ctx_map)
 
     ##########################################################################################
     # Check for .lvversion file
@@ -418,10 +481,9 @@ def main():
     # also check for presense of a file named "LabVIEW 2009" (or similar) in the project root
     # if it exists, then we'll delete it
 
-    labview_version_file_pattern = "LabVIEW [0-9]{4}"
-    re.compile(labview_version_file_pattern)
-    for file in project_folder.iterdir():
-        if re.match(labview_version_file_pattern, file.name):
+    root_entries = list(project_folder.iterdir())
+    for file in root_entries:
+        if _LV_VERSION_FILE_RE.match(file.name):
             logging.info(
                 f"{ascii_warning} Found a LabVIEW version file '{file.name}' in project root. Deleting..."
             )
@@ -443,16 +505,14 @@ def main():
         logging.info(f"{ascii_checkmark} Moved old license agreement file to new location: {new_license}")
 
         # find the line that begins with "Copyright" and update it:
-        with open(new_license, "r") as file:
-            lines = file.readlines()
-            for i, line in enumerate(lines):
-                if line.startswith("Copyright"):
-                    logging.info(f"{ascii_warning} Found old copyright line: {line.strip()}")
-                    logging.info(f"{ascii_checkmark} Updating to new copyright line: {NEW_COPYRIGHT_LINE.strip()}")
-                    lines[i] = NEW_COPYRIGHT_LINE + "\n"
-                    break
-        with open(new_license, "w") as file:
-            file.writelines(lines)
+        license_text = new_license.read_text()
+        copyright_match = re.search(r"^Copyright[^\n]*", license_text, flags=re.MULTILINE)
+        if copyright_match and copyright_match.group(0) != NEW_COPYRIGHT_LINE:
+            logging.info(f"{ascii_warning} Found old copyright line: {copyright_match.group(0).strip()}")
+            logging.info(f"{ascii_checkmark} Updating to new copyright line: {NEW_COPYRIGHT_LINE.strip()}")
+            new_license.write_text(
+                license_text[:copyright_match.start()] + NEW_COPYRIGHT_LINE + license_text[copyright_match.end():]
+            )
 
 
     ##########################################################################################
@@ -545,7 +605,7 @@ def main():
             logging.info(f"{ascii_checkmark} Deleted empty 'ToDo.txt' file.")
 
     # check if dev_docs_folder is empty and delete it
-    if dev_docs_folder.exists() and not list(dev_docs_folder.iterdir()):
+    if dev_docs_folder.exists() and not any(dev_docs_folder.iterdir()):
         logging.info(f"{ascii_warning} Found empty 'dev docs' folder. Deleting...")
         dev_docs_folder.rmdir()
         logging.info(f"{ascii_checkmark} Deleted empty 'dev docs' folder.")
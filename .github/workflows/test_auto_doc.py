@@ -1,6 +1,8 @@
 import pytest # noqa
 from auto_doc import (find_markdown_section, find_markdown_heading, replace_markdown_section_content,
-                      add_markdown_section,add_or_replace_markdown_section_content,)
+                      add_markdown_section,add_or_replace_markdown_section_content,
+                      add_or_replace_markdown_section_lines, github_project_from_url,
+                      get_xml_tag_value, update_readme,)
 
 MARKDOWN_STRING = \
 """
@@ -50,6 +52,10 @@ def test_find_markdown_section_last_section():
     start, end = find_markdown_section(MARKDOWN_LINES, "Section 2")
     assert (start, end) == (6, 8)
 
+def test_find_markdown_section_missing():
+    start, end = find_markdown_section(MARKDOWN_LINES, "Section 3")
+    assert (start, end) == (None, None)
+
 def test_replace_markdown_section_content():
     new_markdown = replace_markdown_section_content(MARKDOWN_STRING, "Section 2", NEW_CONTENT, replace_heading=True)
     assert True, new_markdown == \
@@ -96,6 +102,11 @@ NEW_SECTION_2 = \
 """
 ## Section 2
 
+New Section 2
+""".lstrip()
+
+NEW_SECTION_2_CONTENT = \
+"""
 New Section 2
 """
 
@@ -118,13 +129,95 @@ def test_add_or_replace_markdown_section_content():
     print("Expected Markdown: ", EXPECTED_MARKDOWN)
     assert new_markdown.strip() == EXPECTED_MARKDOWN.strip()
 
+def test_replace_markdown_section_content_keep_heading():
+    new_markdown, changed = replace_markdown_section_content(MARKDOWN_STRING, "Section 2", NEW_SECTION_2_CONTENT)
+    assert changed
+    assert new_markdown.strip() == EXPECTED_MARKDOWN.strip()
+
+def test_add_or_replace_markdown_section_lines():
+    new_lines = add_or_replace_markdown_section_lines(MARKDOWN_STRING.splitlines(), "Section 2",
+                                                      NEW_SECTION_2.splitlines(), replace_heading=True)
+    assert new_lines == EXPECTED_MARKDOWN.splitlines()
+
+def test_github_project_from_url():
+    gh = github_project_from_url("https://github.com/vipm-io/OpenG-Array-Library.git")
+    assert (gh.project_owner, gh.project_name) == ("vipm-io", "OpenG-Array-Library")
+    gh = github_project_from_url("https://github.com/vipm-io/gadget")
+    assert (gh.project_owner, gh.project_name) == ("vipm-io", "gadget")
+
+VIPB_STRING = \
+"""
+<VI_Package_Builder_Settings>
+  <Library_General_Settings>
+    <Package_File_Name>oglib_array</Package_File_Name>
+    <Product_Name>OpenG Array &amp; Matrix Library</Product_Name>
+  </Library_General_Settings>
+  <Advanced_Settings>
+    <Description>
+      <One_Line_Description_Summary>s</One_Line_Description_Summary>
+      <Copyright>c</Copyright>
+      <Description>Array tools.</Description>
+      <Release_Notes/>
+    </Description>
+  </Advanced_Settings>
+</VI_Package_Builder_Settings>
+"""
+
+def test_get_xml_tag_value_nested():
+    assert get_xml_tag_value(VIPB_STRING, "Description") == "Array tools."
+    assert get_xml_tag_value(VIPB_STRING, "Package_File_Name") == "oglib_array"
+
+def test_get_xml_tag_value_escaped():
+    assert get_xml_tag_value(VIPB_STRING, "Product_Name") == "OpenG Array & Matrix Library"
+
+def test_get_xml_tag_value_empty():
+    assert get_xml_tag_value(VIPB_STRING, "Release_Notes") == ""
+    empty_description = VIPB_STRING.replace("<Description>Array tools.</Description>", "<Description/>")
+    assert get_xml_tag_value(empty_description, "Description") == ""
+
+README_CTX = {
+    "package_display_name": "OpenG Array Library",
+    "package_name": "oglib_array",
+    "package_description": "Array tools.",
+    "github_project_name": "OpenG-Array-Library",
+    "github_project_owner": "vipm-io",
+    "year": 2024,
+}
+
+def test_update_readme_is_noop_when_conforming(tmp_path):
+    readme = tmp_path / "README.md"
+    assert update_readme(readme, README_CTX)
+    readme_bytes = readme.read_bytes()
+    assert readme_bytes.endswith(b"\n")
+    assert not update_readme(readme, README_CTX)
+    assert readme.read_bytes() == readme_bytes
+
+def test_update_readme_adds_contributors_as_own_block(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("# Title\n\nSome text\n")
+    assert update_readme(readme, README_CTX)
+    assert "Some text\n\n## Contributors\n" in readme.read_text()
+
+def test_update_readme_adds_how_to_contribute_as_own_block(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("# T\n\n## Contributors\n\nfoo\n")
+    assert update_readme(readme, README_CTX)
+    assert "foo\n\n## How to Contribute\n" in readme.read_text()
+
 if __name__ == "__main__":
     test_find_markdown_heading()
     test_find_markdown_section_easy()
     test_find_markdown_section_last_section()
+    test_find_markdown_section_missing()
     test_replace_markdown_section_content()
     test_add_markdown_section_to_end()
     test_add_markdown_section_to_middle()
     test_add_markdown_section_to_beginning()
     test_add_or_replace_markdown_section_content()
+    test_replace_markdown_section_content_keep_heading()
+    test_add_or_replace_markdown_section_lines()
+    test_github_project_from_url()
+    test_get_xml_tag_value_nested()
+    test_get_xml_tag_value_escaped()
+    test_get_xml_tag_value_empty()
     print("All tests passed!")
\ No newline at end of file